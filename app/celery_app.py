@@ -43,6 +43,8 @@ celery_app.conf.task_routes = {
 }
 
 celery_app.conf.worker_prefetch_multiplier = 1
+celery_app.conf.worker_autoscaler = "app.runtime.autoscaler:SaturationAutoscaler"
+celery_app.conf.worker_consumer = "app.runtime.autoscaler:SaturationConsumer"
 celery_app.conf.task_acks_late = True
 celery_app.conf.task_reject_on_worker_lost = True
 celery_app.conf.timezone = 'UTC'
\ No newline at end of file
@@ -1,5 +1,6 @@
 import socket
 
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Config(BaseSettings):
@@ -28,12 +29,48 @@ class Config(BaseSettings):
     redis_db: int = 3
 
     ip_entry_ttl: int = 3600 + 400
+    heartbeat_interval: int = 15
+
+    autoscale_interval: int = 30
+    autoscale_cpu_high: float = 85.0
+    autoscale_mem_low_pct: float = 10.0
+    autoscale_fd_high: float = 0.8
+    autoscale_tx_drop_ratio: float = 0.01
+    autoscale_throughput_tolerance: float = 0.1
+    autoscale_latency_tolerance: float = 0.2
+    autoscale_ewma_alpha: float = 0.3
+    uplink_packet_rate_budget: int = 0
 
     nmap_open_ports_opts: str = "-p- --open"
     nmap_service_opts: str = "-sV -Pn -T4"
 
+    network_rate_budget: int = 0
+    network_rate_per_scan: int = 0
+    network_rate_min: int = 10
+    network_rate_prefix_v4: int = 24
+    network_rate_prefix_v6: int = 64
+    network_rate_per_project: bool = False
+    network_rate_max_wait: int = 600
+    network_rate_lease_seconds: int = 120
+    network_rate_poll_interval: float = 2.0
+
     logger_name: str = "worker_logger"
-    logger_level: str = "DEBUG"
+    logger_level: str = "INFO"
+    logger_format: str = "json"
+    logger_debug_rate_limit: int = 20
+
+    metrics_port: int = 9808
+    metrics_multiproc_dir: str = "/tmp/worker_metrics"
+    metrics_textfile: str = ""
+
+    tracing_service_name: str = "falcoria-worker"
+    tracing_otlp_endpoint: str = ""
+    tracing_file: str = ""
+
+    profiling_enabled: bool = False
+    profiling_dir: str = "/tmp/worker_profiles"
+    profiling_interval: float = 0.001
+    profiling_min_duration: float = 0.0
 
     backend_base_url: str
     worker_backend_token: str
@@ -42,6 +79,14 @@ class Config(BaseSettings):
 
     model_config = SettingsConfigDict(env_file=".env")
 
+    @model_validator(mode="after")
+    def check_network_rate(self):
+        if 0 < self.network_rate_budget < self.network_rate_min:
+            raise ValueError("network_rate_budget must be at least network_rate_min, or 0 to disable")
+        if self.network_rate_lease_seconds < 3:
+            raise ValueError("network_rate_lease_seconds must be at least 3")
+        return self
+
     @property
     def ampq_connection_str(self):
         return f"pyamqp://{self.rabbitmq_user}:{self.rabbitmq_password}@{self.rabbitmq_host}:{self.rabbitmq_port}/{self.rabbitmq_vhost}"
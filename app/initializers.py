@@ -1,5 +1,20 @@
+from app.metrics import start_metrics_server
+from app.tracing import init_tracing
 from app.runtime.update_ip import register_worker_ip
+from app.runtime.heartbeat import WorkerHeartbeat
 
 
 def init_worker_ip():
-    register_worker_ip()
\ No newline at end of file
+    register_worker_ip()
+
+
+def init_metrics():
+    start_metrics_server()
+
+
+def init_worker_tracing():
+    init_tracing()
+
+
+def init_heartbeat(concurrency):
+    WorkerHeartbeat(concurrency).start()
@@ -1,4 +1,12 @@
+import os
+import re
+import copy
+import json
+import time
+import queue
+import atexit
 import logging
+import logging.handlers
 
 from enum import Enum
 
@@ -13,17 +21,166 @@ class LogLevel(Enum):
     CRITICAL = logging.CRITICAL
 
 
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s'
+REDACTED = "***"
+
+_BEARER_RE = re.compile(r"(Bearer\s+)[A-Za-z0-9\-._~+/]+=*", re.IGNORECASE)
+_URL_CREDENTIALS_RE = re.compile(r"(://[^:/@\s]*:)[^@\s]+(@)")
+
+# Attributes every LogRecord carries; anything else was passed via extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": record.funcName,
+            "pid": record.process,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class Redactor:
+    """Masks configured secrets, bearer tokens and URL credentials."""
+
+    def __init__(self, secrets: list[str]):
+        # Very short values would mangle ordinary words
+        self.secrets = [s for s in secrets if s and len(s) >= 4]
+
+    def __call__(self, text: str) -> str:
+        for secret in self.secrets:
+            text = text.replace(secret, REDACTED)
+        text = _BEARER_RE.sub(rf"\g<1>{REDACTED}", text)
+        return _URL_CREDENTIALS_RE.sub(rf"\g<1>{REDACTED}\g<2>", text)
+
+
+class RedactingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Renders everything that may carry a secret (message, traceback, stack,
+    string extras) in the calling thread, redacts it and enqueues a plain
+    record. The traceback travels in exc_text so formatters can place it.
+    """
+
+    def __init__(self, queue, redactor: Redactor):
+        super().__init__(queue)
+        self.redact = redactor
+        self.exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = self.redact(record.getMessage())
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self.exc_formatter.formatException(record.exc_info)
+        if record.exc_text:
+            record.exc_text = self.redact(record.exc_text)
+        if record.stack_info:
+            record.stack_info = self.redact(record.stack_info)
+        record.exc_info = None
+        for key, value in list(record.__dict__.items()):
+            if key not in _RECORD_ATTRS and isinstance(value, str):
+                setattr(record, key, self.redact(value))
+        return record
+
+
+class DebugRateLimitFilter(logging.Filter):
+    """Lets through at most `limit` DEBUG records per call site per second."""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+        self.windows: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.limit <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = int(time.monotonic())
+        window = self.windows.get(key)
+        if window is None or window[0] != now:
+            self.windows[key] = [now, 1]
+            return True
+        window[1] += 1
+        return window[1] <= self.limit
+
+
 class Logger:
+    """
+    Records are redacted and pushed onto an in-memory queue by the calling
+    thread; a background listener formats and writes them, so a slow stdout
+    never blocks a scan.
+    """
+
     def __init__(self, name, logger_level: LogLevel):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(logger_level.value)
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(funcName)s - %(message)s')
-        ch = logging.StreamHandler()
-        ch.setFormatter(formatter)
-        self.logger.addHandler(ch)
+        self.logger.propagate = False
+
+        self.stream_handler = logging.StreamHandler()
+        if config.logger_format == "json":
+            self.stream_handler.setFormatter(JsonFormatter())
+        else:
+            self.stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        self.queue_handler = RedactingQueueHandler(queue.SimpleQueue(), Redactor([
+            config.worker_backend_token,
+            config.rabbitmq_password,
+            config.redis_pass,
+        ]))
+        self.queue_handler.addFilter(DebugRateLimitFilter(config.logger_debug_rate_limit))
+        self.logger.addHandler(self.queue_handler)
+
+        self._start_listener()
+        # Celery forks pool workers; the listener thread does not survive the fork
+        os.register_at_fork(after_in_child=self._restart_in_child)
+        atexit.register(self._stop_listener)
+
+    def attach(self, other: logging.Logger):
+        """Routes another logger (e.g. Celery's) through the same redacting queue."""
+        for handler in list(other.handlers):
+            other.removeHandler(handler)
+        other.addHandler(self.queue_handler)
+
+    def _start_listener(self):
+        self.listener = logging.handlers.QueueListener(
+            self.queue_handler.queue, self.stream_handler, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def _stop_listener(self):
+        # Stopping enqueues a sentinel and joins, so everything queued so far
+        # is written before this returns
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def _restart_in_child(self):
+        self.queue_handler.queue = queue.SimpleQueue()
+        self._start_listener()
+
+    def flush(self):
+        """
+        Drains the queue and stops the listener. Pool children leave through
+        os._exit, which skips atexit, so they must call this before exiting.
+        """
+        self._stop_listener()
 
     def get_logger(self):
         return self.logger
 
 
-logger = Logger(config.logger_name, LogLevel[config.logger_level.upper()]).get_logger()
\ No newline at end of file
+worker_logging = Logger(config.logger_name, LogLevel[config.logger_level.upper()])
+logger = worker_logging.get_logger()
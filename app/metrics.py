@@ -0,0 +1,128 @@
+import os
+
+from app.config import config
+
+# Celery runs tasks in forked children, so every process writes its samples
+# to a shared directory and the exporter aggregates them on scrape.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", config.metrics_multiproc_dir)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+from prometheus_client import (  # noqa: E402
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    multiprocess,
+    start_http_server,
+    write_to_textfile,
+)
+
+from app.logger import logger  # noqa: E402
+
+
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+QUEUE_WAIT_SECONDS = Histogram(
+    "worker_queue_wait_seconds",
+    "Time between task publication and scan start",
+    ["project", "mode"],
+    buckets=DURATION_BUCKETS,
+)
+NMAP_PHASE_SECONDS = Histogram(
+    "worker_nmap_phase_seconds",
+    "Wall time of a single nmap phase",
+    ["project", "mode", "phase"],
+    buckets=DURATION_BUCKETS,
+)
+REPORT_PROCESSING_SECONDS = Histogram(
+    "worker_report_processing_seconds",
+    "Time spent parsing or enriching nmap XML",
+    ["project", "mode", "stage"],
+    buckets=FAST_BUCKETS,
+)
+UPLOAD_SECONDS = Histogram(
+    "worker_upload_seconds",
+    "Latency of report uploads to ScanLedger",
+    ["project", "mode"],
+    buckets=FAST_BUCKETS + (10, 20, 60),
+)
+UPLOAD_SIZE_BYTES = Histogram(
+    "worker_upload_size_bytes",
+    "Size of report uploads to ScanLedger",
+    ["project", "mode"],
+    buckets=SIZE_BUCKETS,
+)
+REDIS_OPERATION_SECONDS = Histogram(
+    "worker_redis_operation_seconds",
+    "Latency of Redis operations issued by the worker",
+    ["operation"],
+    buckets=FAST_BUCKETS,
+)
+
+SCAN_TIMEOUTS = Counter(
+    "worker_scan_timeouts_total",
+    "Nmap phases terminated because they exceeded the task timeout",
+    ["project", "mode", "phase"],
+)
+SCAN_CANCELLATIONS = Counter(
+    "worker_scan_cancellations_total",
+    "Nmap phases terminated by a cancel request",
+    ["project", "mode", "phase"],
+)
+PARSE_FAILURES = Counter(
+    "worker_parse_failures_total",
+    "Nmap reports that could not be parsed",
+    ["project", "mode"],
+)
+UPLOAD_FAILURES = Counter(
+    "worker_upload_failures_total",
+    "Report uploads that did not succeed",
+    ["project", "mode"],
+)
+
+
+def _aggregated_registry() -> CollectorRegistry:
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def phase_totals() -> dict[str, tuple[float, float]]:
+    """Returns (completed count, total seconds) per nmap phase across all processes."""
+    totals: dict[str, list[float]] = {}
+    for family in _aggregated_registry().collect():
+        if family.name != "worker_nmap_phase_seconds":
+            continue
+        for sample in family.samples:
+            entry = totals.setdefault(sample.labels["phase"], [0.0, 0.0])
+            if sample.name.endswith("_count"):
+                entry[0] += sample.value
+            elif sample.name.endswith("_sum"):
+                entry[1] += sample.value
+    return {phase: (count, total) for phase, (count, total) in totals.items()}
+
+
+def start_metrics_server():
+    """
+    Exposes aggregated metrics over HTTP. Every Celery program imports the
+    tasks module, so only the first one to bind the port serves the endpoint.
+    """
+    if not config.metrics_port:
+        return
+    try:
+        start_http_server(config.metrics_port, registry=_aggregated_registry())
+        logger.info("Metrics endpoint listening on port %s", config.metrics_port)
+    except OSError:
+        logger.debug("Metrics port %s already bound, skipping", config.metrics_port)
+
+
+def export_metrics_textfile():
+    """Writes aggregated metrics for the node_exporter textfile collector."""
+    if not config.metrics_textfile:
+        return
+    try:
+        write_to_textfile(config.metrics_textfile, _aggregated_registry())
+    except OSError as e:
+        logger.warning("Failed to write metrics textfile: %s", e)
@@ -0,0 +1,37 @@
+import os
+import time
+from contextlib import contextmanager
+
+from app.config import config
+from app.logger import logger
+
+
+@contextmanager
+def profile_task(task_id: str, enabled: bool = False):
+    """
+    Samples the current thread with pyinstrument and saves an HTML report
+    under profiling_dir. Enabled per task or for every task via config.
+    """
+    if not (enabled or config.profiling_enabled):
+        yield
+        return
+
+    from pyinstrument import Profiler
+
+    profiler = Profiler(interval=config.profiling_interval)
+    started = time.monotonic()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        duration = time.monotonic() - started
+        if duration >= config.profiling_min_duration:
+            os.makedirs(config.profiling_dir, exist_ok=True)
+            path = os.path.join(config.profiling_dir, f"{task_id}.html")
+            try:
+                with open(path, "w") as f:
+                    f.write(profiler.output_html())
+                logger.info("Saved profile for task %s to %s", task_id, path)
+            except OSError as e:
+                logger.warning("Failed to save profile for task %s: %s", task_id, e)
@@ -0,0 +1,18 @@
+"""
+Clears multiprocess metric files left by previous runs. Run once before
+supervisord starts the Celery programs, never while they are running.
+"""
+import os
+import shutil
+
+from app.config import config
+
+
+def reset_metrics_dir():
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR", config.metrics_multiproc_dir)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+if __name__ == "__main__":
+    reset_metrics_dir()
@@ -0,0 +1,225 @@
+import resource
+import threading
+from time import monotonic, sleep
+from typing import Optional
+
+import psutil
+from celery.worker import state
+from celery.worker.autoscale import Autoscaler
+from celery.worker.consumer import Consumer
+
+from app import metrics
+from app.config import config
+from app.logger import logger
+
+
+def _fd_usage() -> float:
+    """
+    Highest fraction of RLIMIT_NOFILE used by the worker, its pool processes
+    or their nmap children. The limit applies per process, so the fullest
+    one is what runs out first.
+    """
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft <= 0:
+        return 0.0
+    worker = psutil.Process()
+    usage = 0.0
+    for process in [worker] + worker.children(recursive=True):
+        try:
+            usage = max(usage, process.num_fds() / soft)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return usage
+
+
+def _ewma(previous: Optional[float], value: float) -> float:
+    if previous is None:
+        return value
+    return config.autoscale_ewma_alpha * value + (1 - config.autoscale_ewma_alpha) * previous
+
+
+class HostSaturation:
+    def __init__(self):
+        self._last_net = psutil.net_io_counters()
+        psutil.cpu_percent()  # prime the counter, first call always returns 0.0
+
+    def sample(self) -> dict:
+        net = psutil.net_io_counters()
+        dropped = (net.dropout + net.errout) - (self._last_net.dropout + self._last_net.errout)
+        sent = net.packets_sent - self._last_net.packets_sent
+        self._last_net = net
+        memory = psutil.virtual_memory()
+        return {
+            "cpu_percent": psutil.cpu_percent(),
+            "mem_available_pct": memory.available * 100 / memory.total,
+            "fd_usage": _fd_usage(),
+            "tx_drop_ratio": dropped / max(sent + dropped, 1),
+        }
+
+    @staticmethod
+    def saturated_by(sample: dict) -> Optional[str]:
+        if sample["cpu_percent"] >= config.autoscale_cpu_high:
+            return "cpu"
+        if sample["mem_available_pct"] <= config.autoscale_mem_low_pct:
+            return "memory"
+        if sample["fd_usage"] >= config.autoscale_fd_high:
+            return "file descriptors"
+        if sample["tx_drop_ratio"] >= config.autoscale_tx_drop_ratio:
+            return "packet loss"
+        return None
+
+
+class SaturationAutoscaler(Autoscaler):
+    """
+    Keeps a concurrency limit between the --autoscale bounds and tunes it by
+    hill climbing: add a process while the pool is busy and phase throughput
+    keeps improving, step back when it drops or phases slow down, and cut by
+    a quarter when the host is saturated. Consumer prefetch follows the limit.
+
+    The limit is re-evaluated by a sampler thread every autoscale_interval
+    seconds, off the consumer event loop; maybe_scale only applies it.
+    """
+
+    def __init__(self, pool, max_concurrency, min_concurrency=0, worker=None, **kwargs):
+        # With the event loop, maybe_scale runs every keepalive seconds (and
+        # on task arrival), so keep it in step with the evaluation interval
+        kwargs.setdefault("keepalive", config.autoscale_interval)
+        super().__init__(pool, max_concurrency, min_concurrency, worker=worker, **kwargs)
+        self.limit = max(min_concurrency, 1)
+        self.saturation: Optional[HostSaturation] = None
+        self._last_phases = metrics.phase_totals()
+        # Smoothed phases per minute and seconds per phase, with the values
+        # they had before the last evaluation
+        self._throughput: Optional[float] = None
+        self._duration: Optional[float] = None
+        self._prev_throughput: Optional[float] = None
+        self._prev_duration: Optional[float] = None
+        self._last_step = 0
+        self._sampler: Optional[threading.Thread] = None
+
+    def _observe(self, elapsed: float):
+        phases = metrics.phase_totals()
+        done = sum(count for count, _ in phases.values()) - sum(count for count, _ in self._last_phases.values())
+        seconds = sum(total for _, total in phases.values()) - sum(total for _, total in self._last_phases.values())
+        self._last_phases = phases
+
+        self._prev_throughput, self._prev_duration = self._throughput, self._duration
+        self._throughput = _ewma(self._throughput, done * 60 / elapsed)
+        if done > 0:
+            self._duration = _ewma(self._duration, seconds / done)
+
+    def _throughput_dropped(self) -> bool:
+        return bool(
+            self._prev_throughput
+            and self._throughput < self._prev_throughput * (1 - config.autoscale_throughput_tolerance)
+        )
+
+    def _phases_slowed(self) -> bool:
+        return bool(
+            self._prev_duration
+            and self._duration > self._prev_duration * (1 + config.autoscale_latency_tolerance)
+        )
+
+    def _evaluate(self, elapsed: float):
+        sample = self.saturation.sample()
+        self._observe(elapsed)
+        reason = self.saturation.saturated_by(sample)
+        busy = len(state.active_requests) >= self.limit
+
+        if reason:
+            step = -max(1, self.limit // 4)
+        elif self._last_step > 0 and self._throughput_dropped():
+            reason = "throughput dropped"
+            step = -1
+        elif self._phases_slowed():
+            # Longer phases after a step up mean the extra process hurts;
+            # otherwise the targets got slower, so just hold
+            reason = "phases slowed down"
+            step = -1 if self._last_step > 0 else 0
+        elif busy:
+            reason = "pool busy"
+            step = 1
+        else:
+            step = 0
+
+        limit = min(max(self.limit + step, self.min_concurrency, 1), self.max_concurrency)
+        if limit != self.limit:
+            logger.info(
+                "Concurrency limit %s -> %s (%s, %.1f phases/min, %.1fs/phase, %s)",
+                self.limit, limit, reason, self._throughput, self._duration or 0.0, sample
+            )
+        self._last_step = limit - self.limit
+        self.limit = limit
+
+    def _sample_forever(self):
+        # HostSaturation keeps its CPU baseline per thread, so create it here
+        self.saturation = HostSaturation()
+        last = monotonic()
+        while True:
+            sleep(config.autoscale_interval)
+            now = monotonic()
+            try:
+                self._evaluate(now - last)
+            except Exception as e:
+                logger.warning("Autoscaler evaluation failed: %s", e)
+            last = now
+
+    def _sync_prefetch(self):
+        consumer = getattr(self.worker, "consumer", None)
+        qos = getattr(consumer, "qos", None)
+        if qos is None:
+            return
+        consumer.initial_prefetch_count = self.limit * consumer.prefetch_multiplier
+        diff = consumer.initial_prefetch_count - qos.value
+        if diff > 0:
+            qos.increment_eventually(diff)
+        elif diff < 0:
+            qos.decrement_eventually(-diff)
+
+    def _start_sampler(self):
+        # Started from the running worker rather than __init__, so the thread
+        # lives in the main process and not in a pool child
+        self._sampler = threading.Thread(target=self._sample_forever, name="autoscale-sampler", daemon=True)
+        self._sampler.start()
+
+    def _maybe_scale(self, req=None):
+        if self._sampler is None:
+            self._start_sampler()
+        self._sync_prefetch()
+
+        procs = self.processes
+        if procs > self.limit:
+            # Only idle processes can go; busy ones finish their scan first
+            # and are trimmed on a later tick
+            idle = procs - len(state.active_requests)
+            if idle > 0:
+                self._shrink(min(procs - self.limit, idle))
+                return True
+            return False
+        cur = min(self.qty, self.limit)
+        if cur > procs:
+            self.scale_up(cur - procs)
+            return True
+        cur = max(cur, self.min_concurrency)
+        if cur < procs:
+            self.scale_down(procs - cur)
+            return True
+
+    def info(self):
+        info = super().info()
+        info["limit"] = self.limit
+        return info
+
+
+class SaturationConsumer(Consumer):
+    """
+    Celery sizes the initial prefetch from the --autoscale maximum; start
+    from the autoscaler's limit instead so a backlog is not reserved by a
+    worker that will only run one scan at a time.
+    """
+
+    def __init__(self, *args, controller=None, prefetch_multiplier=1, **kwargs):
+        autoscaler = getattr(controller, "autoscaler", None)
+        if isinstance(autoscaler, SaturationAutoscaler) and kwargs.get("initial_prefetch_count"):
+            kwargs["initial_prefetch_count"] = autoscaler.limit * prefetch_multiplier
+        super().__init__(*args, controller=controller, prefetch_multiplier=prefetch_multiplier, **kwargs)
@@ -12,6 +12,7 @@ class OsCommandExecutor:
         self.output: Optional[str] = None
         self.error: Optional[str] = None
         self.return_code: Optional[int] = None
+        self.timed_out = False
 
     def run_foreground(self, command: List[str]) -> bool:
         self.command = command
@@ -30,6 +31,7 @@ class OsCommandExecutor:
         except subprocess.TimeoutExpired as e:
             self.output = e.stdout
             self.error = "Timeout expired"
+            self.timed_out = True
             self.return_code = -1
             return False
         except Exception as e:
@@ -39,7 +41,7 @@ class OsCommandExecutor:
 
     def run_background(self, command: List[str]):
         self.command = command
-        logger.debug(f"Running command: {command}")
+        logger.debug("Running command: %s", command)
         self.process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
@@ -56,11 +58,12 @@ class OsCommandExecutor:
             try:
                 self.process.wait(timeout=effective_timeout)
             except subprocess.TimeoutExpired:
+                self.timed_out = True
                 self.terminate()
 
     def terminate(self):
         if self.process and self.is_running():
-            logger.info(f"Terminating process: {self.process.pid}")
+            logger.info("Terminating process: %s", self.process.pid)
             self.process.terminate()
             try:
                 self.process.wait(timeout=2)
@@ -0,0 +1,106 @@
+import os
+import time
+import threading
+from typing import Callable, Optional
+
+import psutil
+from celery.worker import state
+
+from app import metrics
+from app.config import config
+from app.logger import logger
+from app.redis_client import redis_client
+from falcoria_common.redis.redis_keys import RedisKeyBuilder
+
+
+class WorkerHeartbeat:
+    """
+    Periodically publishes live capacity into the worker's Redis hash next to
+    the registered IP, so the scheduler can favour idle or fast workers.
+    """
+
+    def __init__(self, concurrency: Callable[[], int], interval: int = config.heartbeat_interval):
+        self.concurrency = concurrency
+        self.interval = interval
+        self.hostname = config.hostname
+        self.key = RedisKeyBuilder.worker_key(self.hostname)
+        self.running_key = RedisKeyBuilder.running_tool_key("nmap", self.hostname)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_beat = time.time()
+        self._last_net = psutil.net_io_counters()
+        self._last_phases = metrics.phase_totals()
+
+    def _throughput(self, elapsed: float) -> dict:
+        phases = metrics.phase_totals()
+        data = {}
+        for phase, (count, total) in phases.items():
+            prev_count, prev_total = self._last_phases.get(phase, (0.0, 0.0))
+            done = count - prev_count
+            data[f"phase_{phase}_per_min"] = round(done * 60 / elapsed, 3)
+            data[f"phase_{phase}_avg_seconds"] = round((total - prev_total) / done, 3) if done else 0
+        self._last_phases = phases
+        return data
+
+    def _uplink(self, elapsed: float) -> dict:
+        net = psutil.net_io_counters()
+        data = {
+            "tx_bytes_per_sec": round((net.bytes_sent - self._last_net.bytes_sent) / elapsed, 1),
+            "tx_packets_per_sec": round((net.packets_sent - self._last_net.packets_sent) / elapsed, 1),
+            "packet_rate_budget": config.uplink_packet_rate_budget,
+        }
+        self._last_net = net
+        return data
+
+    def collect(self) -> dict:
+        now = time.time()
+        elapsed = max(now - self._last_beat, 1e-3)
+        self._last_beat = now
+
+        concurrency = self.concurrency()
+        # Tasks waiting on a rate lease, parsing or uploading hold a slot too,
+        # so occupancy comes from Celery rather than the nmap PID hash
+        active = len(state.active_requests)
+        data = {
+            "concurrency": concurrency,
+            "active_tasks": active,
+            "running_nmap": redis_client.hlen(self.running_key),
+            "free_slots": max(concurrency - active, 0),
+            "cpu_count": os.cpu_count() or 1,
+            "cpu_percent": psutil.cpu_percent(),
+            "load_1m": round(os.getloadavg()[0], 2),
+            "mem_available_mb": psutil.virtual_memory().available // (1024 * 1024),
+            "heartbeat_at": int(now),
+        }
+        data.update(self._throughput(elapsed))
+        data.update(self._uplink(elapsed))
+        return data
+
+    def beat(self):
+        data = self.collect()
+        with metrics.REDIS_OPERATION_SECONDS.labels("heartbeat").time():
+            redis_client.hset(self.key, mapping=data)
+
+    def _run(self):
+        # psutil keeps the previous CPU sample per thread, so the counter has to
+        # be primed here; the short wait gives the first beat a real interval
+        psutil.cpu_percent()
+        if self._stop.wait(1):
+            return
+        while True:
+            try:
+                self.beat()
+            except Exception as e:
+                logger.warning("Heartbeat failed: %s", e)
+            if self._stop.wait(self.interval):
+                return
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="worker-heartbeat", daemon=True)
+        self._thread.start()
+        logger.info("Heartbeat started, interval %ss", self.interval)
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,254 @@
+import io
+import os
+import mmap
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple, Iterator, Union
+from xml.parsers import expat
+from xml.sax.saxutils import quoteattr
+
+
+# (start, end) byte offsets of an element inside the nmap XML file
+Span = Tuple[int, int]
+
+_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(slots=True)
+class PortRecord:
+    protocol: str
+    portid: int
+    span: Span = (0, 0)
+    state: str = ""
+    service_name: str = ""
+    service: Optional[Span] = None
+    scripts: List[Span] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class HostRecord:
+    span: Span = (0, 0)
+    address: str = ""
+    hostnames: Optional[Span] = None
+    ports: List[PortRecord] = field(default_factory=list)
+
+
+class _SpanParser:
+    """
+    Streams an nmap XML file through expat and records only what the worker
+    needs: addresses, port states and the byte spans of the elements that
+    get spliced during enrichment. Nothing else is kept in memory.
+    """
+
+    def __init__(self, data: mmap.mmap):
+        self.data = data
+        self.path: List[str] = []
+        self.hosts: List[HostRecord] = []
+        self.host: Optional[HostRecord] = None
+        self.port: Optional[PortRecord] = None
+        self.starts: dict = {}
+        self.parser = expat.ParserCreate()
+        self.parser.StartElementHandler = self._start
+        self.parser.EndElementHandler = self._end
+
+    def _element_end(self, name: str, index: int) -> int:
+        # Expat reports the start of "</name>" for regular elements and the
+        # position right after "/>" for self-closing ones
+        close = b"</" + name.encode()
+        after = self.data[index + len(close):index + len(close) + 1]
+        if self.data[index:index + len(close)] == close and after in (b">", b" ", b"\t", b"\r", b"\n"):
+            return self.data.find(b">", index) + 1
+        return index
+
+    def _start(self, name: str, attrs: dict):
+        index = self.parser.CurrentByteIndex
+        parent = self.path[-1] if self.path else None
+        self.path.append(name)
+
+        if name == "host" and len(self.path) == 2:
+            self.host = HostRecord()
+            self.starts["host"] = index
+        elif self.host is None:
+            return
+        elif parent == "host":
+            if name == "address" and not self.host.address:
+                self.host.address = attrs.get("addr", "")
+            elif name == "hostnames":
+                self.starts["hostnames"] = index
+        elif name == "port" and parent == "ports":
+            self.port = PortRecord(protocol=attrs.get("protocol", ""), portid=int(attrs.get("portid", 0)))
+            self.starts["port"] = index
+        elif self.port is not None and parent == "port":
+            if name == "state":
+                self.port.state = attrs.get("state", "")
+            elif name in ("service", "script"):
+                if name == "service":
+                    self.port.service_name = attrs.get("name", "")
+                self.starts[name] = index
+
+    def _end(self, name: str):
+        depth = len(self.path)
+        self.path.pop()
+        if self.host is None:
+            return
+        if name not in self.starts:
+            return
+
+        index = self.parser.CurrentByteIndex
+        span = (self.starts.pop(name), self._element_end(name, index))
+        if name == "host" and depth == 2:
+            self.host.span = span
+            self.hosts.append(self.host)
+            self.host = None
+        elif name == "hostnames":
+            self.host.hostnames = span
+        elif name == "port" and self.port is not None:
+            self.port.span = span
+            self.host.ports.append(self.port)
+            self.port = None
+        elif name == "service" and self.port is not None:
+            self.port.service = span
+        elif name == "script" and self.port is not None:
+            self.port.scripts.append(span)
+
+    def parse(self, f: io.BufferedReader) -> List[HostRecord]:
+        self.parser.ParseFile(f)
+        return self.hosts
+
+
+class NmapResult:
+    """
+    Compact view of an nmap XML report. Host and port records are small and
+    slotted; service and script output stay in the file and are referenced
+    by byte span until the report is rendered for upload.
+    """
+
+    def __init__(self, path: str, hosts: List[HostRecord]):
+        self.path = path
+        self.hosts = hosts
+
+    @classmethod
+    def from_file(cls, path: str) -> Optional["NmapResult"]:
+        if not path or not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                hosts = _SpanParser(data).parse(f)
+        except (expat.ExpatError, ValueError, OSError):
+            return None
+        return cls(path, hosts)
+
+    def open_ports(self, host: HostRecord) -> List[int]:
+        return [port.portid for port in host.ports if port.state == "open"]
+
+    def cleanup(self):
+        """Deletes the XML file; the result must not be rendered afterwards."""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# A piece of output is either literal bytes or a span of another report file
+Piece = Union[bytes, Tuple[str, Span]]
+
+
+class EnrichedNmapReport:
+    """
+    Base report plus a list of non-overlapping edits. The final XML is
+    streamed from the files on disk only when the report is rendered, so
+    the report owns those files until cleanup() after the upload.
+    """
+
+    def __init__(self, base: NmapResult, service: Optional[NmapResult] = None):
+        self.base = base
+        self.service = service
+        self.edits: List[Tuple[int, int, List[Piece]]] = []
+
+    def replace(self, span: Span, pieces: List[Piece]):
+        self.edits.append((span[0], span[1], pieces))
+
+    def insert(self, offset: int, pieces: List[Piece]):
+        self.edits.append((offset, offset, pieces))
+
+    @staticmethod
+    def _copy(f: io.BufferedReader, start: int, end: int) -> Iterator[bytes]:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        sources = {}
+        try:
+            with open(self.base.path, "rb") as base:
+                position = 0
+                for start, end, pieces in sorted(self.edits, key=lambda e: (e[0], e[1])):
+                    yield from self._copy(base, position, start)
+                    for piece in pieces:
+                        if isinstance(piece, bytes):
+                            yield piece
+                            continue
+                        path, (piece_start, piece_end) = piece
+                        if path not in sources:
+                            sources[path] = open(path, "rb")
+                        yield from self._copy(sources[path], piece_start, piece_end)
+                    position = max(position, end)
+                yield from self._copy(base, position, os.path.getsize(self.base.path))
+        finally:
+            for source in sources.values():
+                source.close()
+
+    def to_bytes(self) -> bytes:
+        return b"".join(self.iter_chunks())
+
+    def cleanup(self):
+        self.base.cleanup()
+        if self.service is not None:
+            self.service.cleanup()
+
+
+def _hostnames_xml(hostnames: List[str]) -> bytes:
+    if not hostnames:
+        return b"<hostnames />"
+    entries = "".join(f'<hostname name={quoteattr(name)} type="user" />' for name in hostnames)
+    return f"<hostnames>{entries}</hostnames>".encode("utf-8")
+
+
+def enrich(
+    base: NmapResult,
+    service: Optional[NmapResult],
+    target_ip: str,
+    hostnames: List[str]
+) -> EnrichedNmapReport:
+    report = EnrichedNmapReport(base, service)
+
+    service_map = {}
+    if service is not None:
+        for host in service.hosts:
+            for port in host.ports:
+                service_map[(host.address, port.portid, port.protocol)] = port
+
+    for host in base.hosts:
+        # Step 1: Inject hostnames
+        if host.address == target_ip:
+            if host.hostnames is not None:
+                report.replace(host.hostnames, [_hostnames_xml(hostnames)])
+            else:
+                report.insert(host.span[1] - len(b"</host>"), [_hostnames_xml(hostnames)])
+
+        # Step 2: Replace service and script output with the service scan's
+        for port in host.ports:
+            service_port = service_map.get((host.address, port.portid, port.protocol))
+            if service_port is None:
+                continue
+            for old in ([port.service] if port.service else []) + port.scripts:
+                report.replace(old, [])
+            new = ([service_port.service] if service_port.service else []) + service_port.scripts
+            report.insert(
+                port.span[1] - len(b"</port>"),
+                [(service.path, span) for span in new]
+            )
+
+    return report
@@ -1,12 +1,9 @@
 import os
 import tempfile
 from typing import Optional, List, Dict
-import xml.etree.ElementTree as ET
-
-from libnmap.objects.report import NmapReport
-from libnmap.parser import NmapParser, NmapParserException
 
 from .command_executor import OsCommandExecutor
+from .nmap_result import NmapResult, EnrichedNmapReport, enrich
 
 from app.config import config
 
@@ -48,114 +45,48 @@ class NmapRunner:
     def terminate(self):
         self.executor.terminate()
 
-    def parse_output(self) -> Optional[NmapReport]:
-        if not self.output_file or not os.path.exists(self.output_file):
-            return None
-        try:
-            return NmapParser.parse_fromfile(self.output_file)
-        except (NmapParserException, Exception):
-            return None
+    def parse_output(self) -> Optional[NmapResult]:
+        """
+        Parses the XML output. The returned result takes over the file, since
+        its spans are read back when the report is rendered.
+        """
+        result = NmapResult.from_file(self.output_file)
+        if result is not None:
+            self.output_file = None
+        return result
 
-    def read_output(self) -> Optional[str]:
-        if not self.output_file or not os.path.exists(self.output_file):
-            return None
-        with open(self.output_file, "r") as f:
-            return f.read()
-    
     @staticmethod
     def enrich_nmap_report(
-        base_xml_path: str,
-        service_xml_path: Optional[str],
+        base_report: NmapResult,
+        service_report: Optional[NmapResult],
         target_ip: str,
         hostnames: List[str]
-    ) -> Optional[str]:
+    ) -> EnrichedNmapReport:
         """
-        Enriches Nmap base XML report with:
+        Enriches Nmap base report with:
         1. Hostnames for the given IP
         2. Service metadata (from optional second scan)
         
-        Returns modified XML string.
+        Returns a lazy report; XML is only produced when it is rendered
+        for upload.
         """
-        if not os.path.exists(base_xml_path):
-            return None
-
-        with open(base_xml_path, "r") as f:
-            base_tree = ET.ElementTree(ET.fromstring(f.read()))
-        base_root = base_tree.getroot()
-
-        # Step 1: Inject hostnames
-        for host in base_root.findall("host"):
-            addr_elem = host.find("address")
-            if addr_elem is not None and addr_elem.attrib.get("addr") == target_ip:
-                hostnames_elem = host.find("hostnames")
-                if hostnames_elem is None:
-                    hostnames_elem = ET.SubElement(host, "hostnames")
-                else:
-                    hostnames_elem.clear()
-
-                for hname in hostnames:
-                    ET.SubElement(
-                        hostnames_elem, "hostname",
-                        attrib={"name": hname, "type": "user"}
-                    )
-
-        # Step 2: Inject service data
-        if service_xml_path and os.path.exists(service_xml_path):
-            with open(service_xml_path, "r") as f:
-                service_tree = ET.ElementTree(ET.fromstring(f.read()))
-            service_root = service_tree.getroot()
-
-            # Build lookup for services by (ip, portid, protocol)
-            service_map = {}
-            for host in service_root.findall("host"):
-                addr_elem = host.find("address")
-                if addr_elem is None:
-                    continue
-                ip = addr_elem.attrib.get("addr")
-                for port in host.findall(".//port"):
-                    key = (ip, port.attrib.get("portid"), port.attrib.get("protocol"))
-                    service_map[key] = port
-
-            # Inject into base
-            for host in base_root.findall("host"):
-                addr_elem = host.find("address")
-                if addr_elem is None:
-                    continue
-                ip = addr_elem.attrib.get("addr")
-                for port in host.findall(".//port"):
-                    key = (ip, port.attrib.get("portid"), port.attrib.get("protocol"))
-                    service_port = service_map.get(key)
-                    if not service_port:
-                        continue
-
-                    # Clean old <service> and <script>
-                    for tag in ["service", "script"]:
-                        old_tag = port.find(tag)
-                        if old_tag is not None:
-                            port.remove(old_tag)
-                        new_tag = service_port.find(tag)
-                        if new_tag is not None:
-                            port.append(new_tag)
-
-        return ET.tostring(base_root, encoding="utf-8", xml_declaration=True).decode("utf-8")
+        return enrich(base_report, service_report, target_ip, hostnames)
 
     @staticmethod
-    def get_open_ports_single_host(report: NmapReport) -> List[int]:
+    def get_open_ports_single_host(report: NmapResult) -> List[int]:
         if len(report.hosts) != 1:
             raise ValueError("Expected exactly one host in the report.")
-        host = report.hosts[0]
-        return [port for port, _ in host.get_open_ports()]
+        return report.open_ports(report.hosts[0])
 
     @staticmethod
-    def get_port_service_map_single_host(report: NmapReport) -> Dict[int, str]:
+    def get_port_service_map_single_host(report: NmapResult) -> Dict[int, str]:
         if len(report.hosts) != 1:
             raise ValueError("Expected exactly one host in the report.")
         host = report.hosts[0]
-        return {service.port: service.service for service in host.services}
+        return {port.portid: port.service_name for port in host.ports}
 
     def cleanup(self):
+        """Removes output that was never handed to a parsed result."""
         if self.output_file and os.path.exists(self.output_file):
             os.remove(self.output_file)
-
-    def __del__(self):
-        self.cleanup()
+        self.output_file = None
@@ -0,0 +1,208 @@
+import re
+import time
+import ipaddress
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from app import metrics
+from app.config import config
+from app.logger import logger
+from app.redis_client import redis_client
+
+
+# Only ever lengthens a key's TTL, so a short lease cannot expire the
+# keys out from under a longer one
+_EXTEND_TTL = """
+local function extend(key, ttl)
+    if redis.call('TTL', key) < ttl then
+        redis.call('EXPIRE', key, ttl)
+    end
+end
+"""
+
+# Leases hold a share of the network's packet-rate budget for as long as an
+# nmap phase runs. Expired leases (crashed workers) are reclaimed first.
+# A forced acquire records the minimum rate even over budget, so fallback
+# traffic is still counted against the network.
+_ACQUIRE_SCRIPT = _EXTEND_TTL + """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, lease in ipairs(expired) do
+    redis.call('HDEL', KEYS[2], lease)
+    redis.call('ZREM', KEYS[1], lease)
+end
+
+local used = 0
+for _, rate in ipairs(redis.call('HVALS', KEYS[2])) do
+    used = used + tonumber(rate)
+end
+
+local free = tonumber(ARGV[2]) - used
+local grant
+if free >= tonumber(ARGV[4]) then
+    grant = math.min(tonumber(ARGV[3]), free)
+elseif ARGV[7] == '1' then
+    grant = tonumber(ARGV[4])
+else
+    return 0
+end
+
+redis.call('HSET', KEYS[2], ARGV[5], grant)
+redis.call('ZADD', KEYS[1], ARGV[6], ARGV[5])
+local ttl = math.ceil(tonumber(ARGV[6]) - tonumber(ARGV[1]))
+extend(KEYS[1], ttl)
+extend(KEYS[2], ttl)
+return grant
+"""
+
+# Pushes a live lease's expiry forward; returns 0 if it was already reclaimed
+_RENEW_SCRIPT = _EXTEND_TTL + """
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+extend(KEYS[1], tonumber(ARGV[3]))
+extend(KEYS[2], tonumber(ARGV[3]))
+return 1
+"""
+
+_MAX_RATE_RE = re.compile(r"--max-rate[ =](\S+)")
+
+
+def target_network(target: str, prefix_v4: int, prefix_v6: int) -> str:
+    try:
+        ip = ipaddress.ip_address(target)
+    except ValueError:
+        return target
+    prefix = prefix_v4 if ip.version == 4 else prefix_v6
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+def apply_max_rate(options: str, rate: Optional[int]) -> str:
+    """Adds --max-rate to nmap options, keeping a stricter user-supplied value."""
+    if rate is None:
+        return options
+    match = _MAX_RATE_RE.search(options)
+    if match:
+        try:
+            if float(match.group(1)) <= rate:
+                return options
+        except ValueError:
+            pass
+        options = _MAX_RATE_RE.sub("", options)
+    return f"{options} --max-rate {rate}".strip()
+
+
+class NetworkRateLimiter:
+    """
+    Fleet-wide packet-rate budget per target network. Each nmap phase leases
+    a share of the budget before it starts and returns it when it ends, so
+    the sum of --max-rate values across all workers stays within the budget.
+    """
+
+    def __init__(self, project: str):
+        self.redis = redis_client
+        self.budget = config.network_rate_budget
+        self.per_scan = config.network_rate_per_scan or self.budget
+        self.min_rate = config.network_rate_min
+        self.scope = f"{project}:" if config.network_rate_per_project else ""
+        self.lease_seconds = config.network_rate_lease_seconds
+        self.acquire_script = self.redis.register_script(_ACQUIRE_SCRIPT)
+        self.renew_script = self.redis.register_script(_RENEW_SCRIPT)
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def _keys(self, network: str) -> list[str]:
+        base = f"ratelimit:{self.scope}{network}"
+        return [f"{base}:expiry", f"{base}:rates"]
+
+    def _network(self, target: str) -> str:
+        return target_network(target, config.network_rate_prefix_v4, config.network_rate_prefix_v6)
+
+    def acquire(self, target: str, lease_id: str, cancelled: Callable[[], bool] = lambda: False) -> Optional[int]:
+        """
+        Blocks until a share of the budget is free and returns the granted
+        rate. After network_rate_max_wait it records a lease at the minimum
+        rate, over budget if need be, rather than starving the task. Returns
+        None without a lease if the task is cancelled while waiting.
+        """
+        if not self.enabled:
+            return None
+
+        network = self._network(target)
+        keys = self._keys(network)
+        deadline = time.monotonic() + config.network_rate_max_wait
+
+        force = False
+        while True:
+            now = time.time()
+            with metrics.REDIS_OPERATION_SECONDS.labels("rate_limit_acquire").time():
+                granted = int(self.acquire_script(
+                    keys=keys,
+                    args=[
+                        now, self.budget, self.per_scan, self.min_rate,
+                        lease_id, now + self.lease_seconds, int(force)
+                    ]
+                ))
+            if granted:
+                if force:
+                    logger.warning("Rate budget for %s exhausted, proceeding at %s pps", network, granted)
+                else:
+                    logger.debug("Leased %s pps on %s for %s", granted, network, lease_id)
+                return granted
+            if cancelled():
+                return None
+            if time.monotonic() >= deadline:
+                force = True
+                continue
+            time.sleep(config.network_rate_poll_interval)
+
+    def renew(self, target: str, lease_id: str) -> bool:
+        keys = self._keys(self._network(target))
+        now = time.time()
+        with metrics.REDIS_OPERATION_SECONDS.labels("rate_limit_renew").time():
+            return bool(self.renew_script(keys=keys, args=[lease_id, now + self.lease_seconds, self.lease_seconds]))
+
+    def _keep_renewed(self, target: str, lease_id: str, stop: threading.Event):
+        while not stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.renew(target, lease_id):
+                    logger.warning("Rate lease %s was reclaimed before the phase finished", lease_id)
+                    return
+            except Exception as e:
+                logger.warning("Failed to renew rate lease %s: %s", lease_id, e)
+
+    @contextmanager
+    def lease(self, target: str, lease_id: str, cancelled: Callable[[], bool] = lambda: False) -> Iterator[Optional[int]]:
+        """
+        Holds a lease for the duration of the block, renewing it in the
+        background so phases of any length keep their share of the budget.
+        """
+        rate = self.acquire(target, lease_id, cancelled)
+        if not self.enabled or rate is None:
+            yield rate
+            return
+
+        stop = threading.Event()
+        renewer = threading.Thread(
+            target=self._keep_renewed, args=(target, lease_id, stop), name="rate-lease-renew", daemon=True
+        )
+        renewer.start()
+        try:
+            yield rate
+        finally:
+            stop.set()
+            renewer.join()
+            self.release(target, lease_id)
+
+    def release(self, target: str, lease_id: str):
+        if not self.enabled:
+            return
+        expiry_key, rates_key = self._keys(self._network(target))
+        with metrics.REDIS_OPERATION_SECONDS.labels("rate_limit_release").time():
+            pipe = self.redis.pipeline()
+            pipe.hdel(rates_key, lease_id)
+            pipe.zrem(expiry_key, lease_id)
+            pipe.execute()
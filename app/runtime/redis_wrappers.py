@@ -2,15 +2,22 @@ import os
 import json
 import errno
 import signal
+from contextlib import contextmanager
+from typing import Optional
 
+from opentelemetry import trace
 
+from app import metrics
+from app.tracing import tracer
 from app.logger import logger
 from app.config import config
 from falcoria_common.schemas.enums.common import ImportMode
 from falcoria_common.schemas.nmap import RunningNmapTarget
 from .nmap_runner import NmapRunner
+from .nmap_result import NmapResult
 from .command_executor import OsCommandExecutor
 from .scanledger_connector import ScanledgerConnector
+from .rate_limiter import NetworkRateLimiter, apply_max_rate
 from falcoria_common.redis.redis_keys import RedisKeyBuilder
 from falcoria_common.redis.redis_task_tracker import BaseRedisTracker
 from app.redis_client import redis_client
@@ -25,12 +32,12 @@ def _is_pid_alive(pid: int) -> bool:
 
 
 def _terminate_pid(pid: int, hostname: str):
-    logger.info(f"Attempting to kill PID {pid} on {hostname}")
+    logger.info("Attempting to kill PID %s on %s", pid, hostname)
     if _is_pid_alive(pid):
         os.kill(pid, signal.SIGTERM)
-        logger.info(f"SIGTERM sent to PID {pid}")
+        logger.info("SIGTERM sent to PID %s", pid)
     else:
-        logger.warning(f"Process {pid} already exited.")
+        logger.warning("Process %s already exited.", pid)
 
 
 class RedisTaskTracker(BaseRedisTracker):
@@ -44,11 +51,13 @@ class RedisTaskTracker(BaseRedisTracker):
     def store_running_target(self, task_id: str, target: RunningNmapTarget):
         key = RedisKeyBuilder.running_tasks_key(task_id, self.hostname)
         value = target.model_dump_json()
-        self.redis.rpush(key, value)
+        with metrics.REDIS_OPERATION_SECONDS.labels("store_running_target").time():
+            self.redis.rpush(key, value)
 
     def delete_running_task_entry(self, task_id: str):
         key = RedisKeyBuilder.running_tasks_key(task_id, self.hostname)
-        self.redis.delete(key)
+        with metrics.REDIS_OPERATION_SECONDS.labels("delete_running_task_entry").time():
+            self.redis.delete(key)
 
     def remove_running_target(self, ip: str, worker: str):
         key = RedisKeyBuilder.running_targets_key(self.project)
@@ -60,15 +69,30 @@ class RedisTaskTracker(BaseRedisTracker):
                 break
 
     def track_pid_entry(self, pid: int, task_id: str):
-        self.redis.hset(self.hash_key, task_id, pid)
+        with metrics.REDIS_OPERATION_SECONDS.labels("track_pid_entry").time():
+            self.redis.hset(self.hash_key, task_id, pid)
 
     def remove_pid_entry(self, task_id: str):
-        self.redis.hdel(self.hash_key, task_id)
+        with metrics.REDIS_OPERATION_SECONDS.labels("remove_pid_entry").time():
+            self.redis.hdel(self.hash_key, task_id)
 
     def get_pid_for_task(self, task_id: str):
-        pid = self.redis.hget(self.hash_key, task_id)
+        with metrics.REDIS_OPERATION_SECONDS.labels("get_pid_for_task").time():
+            pid = self.redis.hget(self.hash_key, task_id)
         return int(pid) if pid else None
 
+    @staticmethod
+    def cancel_key(task_id: str) -> str:
+        return f"cancelled_task:{task_id}"
+
+    def mark_cancelled(self, task_id: str):
+        with metrics.REDIS_OPERATION_SECONDS.labels("mark_cancelled").time():
+            self.redis.set(self.cancel_key(task_id), 1, ex=config.ip_entry_ttl)
+
+    def is_cancelled(self, task_id: str) -> bool:
+        with metrics.REDIS_OPERATION_SECONDS.labels("is_cancelled").time():
+            return bool(self.redis.exists(self.cancel_key(task_id)))
+
 
 class RedisNmapWrapper:
     def __init__(self, project: str):
@@ -76,7 +100,70 @@ class RedisNmapWrapper:
         self.hostname = config.hostname
         self.tool = "nmap"
         self.redis_tracker = RedisTaskTracker(project, self.tool)
+        self.rate_limiter = NetworkRateLimiter(project)
+
+    @contextmanager
+    def _rate_lease(self, target: str, task_id: str, phase: str):
+        lease_id = f"{task_id}:{phase}"
+        with self.rate_limiter.lease(target, lease_id, lambda: self.redis_tracker.is_cancelled(task_id)) as rate:
+            if rate is not None:
+                trace.get_current_span().set_attribute(f"nmap.{phase}.max_rate", rate)
+            yield rate
+
+    def _cancelled_before_start(self, task_id: str, phase: str, mode: ImportMode) -> bool:
+        # Cancels that arrive while no PID is registered (waiting for a rate
+        # lease, between phases) are only visible through the marker
+        if not self.redis_tracker.is_cancelled(task_id):
+            return False
+        metrics.SCAN_CANCELLATIONS.labels(self.project, mode.value, phase).inc()
+        logger.info("Task %s cancelled before %s phase", task_id, phase)
+        return True
+
+    def _wait_phase(self, nmap: NmapRunner, executor: OsCommandExecutor, task_id: str, phase: str, mode: ImportMode) -> bool:
+        """Waits for an nmap phase to finish. Returns False if the task was cancelled."""
+        labels = {"project": self.project, "mode": mode.value, "phase": phase}
+        self.redis_tracker.track_pid_entry(pid=executor.process.pid, task_id=task_id)
+        if self.redis_tracker.is_cancelled(task_id):
+            # Cancel raced with the PID being registered
+            nmap.terminate()
+        with tracer.start_as_current_span(f"NmapRunner.{phase}") as span, \
+                metrics.NMAP_PHASE_SECONDS.labels(**labels).time():
+            span.set_attribute("process.pid", executor.process.pid)
+            nmap.wait()
+            span.set_attribute("nmap.timed_out", executor.timed_out)
+        self.redis_tracker.remove_pid_entry(task_id)
+
+        if executor.timed_out:
+            metrics.SCAN_TIMEOUTS.labels(**labels).inc()
+        elif self.redis_tracker.is_cancelled(task_id):
+            metrics.SCAN_CANCELLATIONS.labels(**labels).inc()
+            logger.info("Task %s cancelled during %s phase", task_id, phase)
+            return False
+        return True
+
+    def _enrich_and_upload(
+        self,
+        scanledger_connector: ScanledgerConnector,
+        base_report: NmapResult,
+        service_report: Optional[NmapResult],
+        target: str,
+        hostnames: list,
+        mode: ImportMode
+    ):
+        with tracer.start_as_current_span("enrich_nmap_report"), \
+                metrics.REPORT_PROCESSING_SECONDS.labels(self.project, mode.value, "enrich").time():
+            final_report = NmapRunner.enrich_nmap_report(
+                base_report=base_report,
+                service_report=service_report,
+                target_ip=target,
+                hostnames=hostnames
+            )
+        try:
+            scanledger_connector.upload_nmap_report(self.project, final_report, mode)
+        finally:
+            final_report.cleanup()
 
+    @tracer.start_as_current_span("run_two_phase_background")
     def run_two_phase_background(
         self,
         target: str,
@@ -93,61 +180,65 @@ class RedisNmapWrapper:
         # Phase 1: Port scan
         executor1 = OsCommandExecutor(timeout=timeout)
         nmap1 = NmapRunner(executor1)
-
-        nmap1.run_open_ports_background(target, open_ports_opts)
-        self.redis_tracker.track_pid_entry(pid=executor1.process.pid, task_id=task_id)
-        nmap1.wait()
-        self.redis_tracker.remove_pid_entry(task_id)
-
-        report = nmap1.parse_output()
-        if not report:
-            logger.error("Failed to parse report from open ports phase.")
-            return
-
-        open_ports = nmap1.get_open_ports_single_host(report)
-        if not open_ports:
-            logger.info(f"No open ports found for target {target}. Uploading base scan with hostnames.")
-            final_xml = nmap1.enrich_nmap_report(
-                base_xml_path=nmap1.output_file,
-                service_xml_path=None,
-                target_ip=target,
-                hostnames=hostnames
-            )
-            scanledger_connector.upload_nmap_report(self.project, final_xml, mode)
-            return
-
-        if not include_services:
-            logger.info(f"Open ports found: {open_ports}. Uploading base scan without service enrichment.")
-            final_xml = nmap1.enrich_nmap_report(
-                base_xml_path=nmap1.output_file,
-                service_xml_path=None,
-                target_ip=target,
-                hostnames=hostnames
-            )
-            scanledger_connector.upload_nmap_report(self.project, final_xml, mode)
-            return
-
-        # Phase 2: Service scan on open ports only
-        executor2 = OsCommandExecutor(timeout=timeout)
-        nmap2 = NmapRunner(executor2)
-
-        logger.info(f"Running service scan on ports: {open_ports}")
-        nmap2.run_service_scan_background(target, open_ports, service_opts)
-
-        self.redis_tracker.track_pid_entry(pid=executor2.process.pid, task_id=task_id)
-        nmap2.wait()
-        self.redis_tracker.remove_pid_entry(task_id)
-
-        logger.info(f"Two-phase scan completed for {target}. Uploading merged result.")
-
-        # Merge phase 1 + phase 2 results into one enriched XML
-        final_xml = nmap1.enrich_nmap_report(
-            base_xml_path=nmap1.output_file,
-            service_xml_path=nmap2.output_file,
-            target_ip=target,
-            hostnames=hostnames
-        )
-        scanledger_connector.upload_nmap_report(self.project, final_xml, mode)
+        nmap2 = None
+        report = service_report = None
+
+        try:
+            with self._rate_lease(target, task_id, "open_ports") as rate:
+                if self._cancelled_before_start(task_id, "open_ports", mode):
+                    return
+                nmap1.run_open_ports_background(target, apply_max_rate(open_ports_opts, rate))
+                if not self._wait_phase(nmap1, executor1, task_id, "open_ports", mode):
+                    return
+
+            with tracer.start_as_current_span("parse_output"), \
+                    metrics.REPORT_PROCESSING_SECONDS.labels(self.project, mode.value, "parse").time():
+                report = nmap1.parse_output()
+            if not report:
+                metrics.PARSE_FAILURES.labels(self.project, mode.value).inc()
+                logger.error("Failed to parse report from open ports phase.")
+                return
+
+            open_ports = nmap1.get_open_ports_single_host(report)
+            if not open_ports:
+                logger.info("No open ports found for target %s. Uploading base scan with hostnames.", target)
+                self._enrich_and_upload(scanledger_connector, report, None, target, hostnames, mode)
+                return
+
+            if not include_services:
+                logger.info("Open ports found: %s. Uploading base scan without service enrichment.", open_ports)
+                self._enrich_and_upload(scanledger_connector, report, None, target, hostnames, mode)
+                return
+
+            # Phase 2: Service scan on open ports only
+            executor2 = OsCommandExecutor(timeout=timeout)
+            nmap2 = NmapRunner(executor2)
+
+            logger.info("Running service scan on ports: %s", open_ports)
+            with self._rate_lease(target, task_id, "services") as rate:
+                if self._cancelled_before_start(task_id, "services", mode):
+                    return
+                nmap2.run_service_scan_background(target, open_ports, apply_max_rate(service_opts, rate))
+                if not self._wait_phase(nmap2, executor2, task_id, "services", mode):
+                    return
+
+            logger.info("Two-phase scan completed for %s. Uploading merged result.", target)
+
+            with tracer.start_as_current_span("parse_output"), \
+                    metrics.REPORT_PROCESSING_SECONDS.labels(self.project, mode.value, "parse").time():
+                service_report = nmap2.parse_output()
+            if not service_report:
+                metrics.PARSE_FAILURES.labels(self.project, mode.value).inc()
+                logger.error("Failed to parse report from service phase, uploading base scan.")
+
+            # Merge phase 1 + phase 2 results into one enriched report
+            self._enrich_and_upload(scanledger_connector, report, service_report, target, hostnames, mode)
+        finally:
+            # Output files live until the report is uploaded; whatever an
+            # early return left behind is removed here
+            for owner in (nmap1, nmap2, report, service_report):
+                if owner is not None:
+                    owner.cleanup()
 
 
 class RedisProcessKiller:
@@ -162,6 +253,9 @@ class RedisProcessKiller:
             return
 
         for task_id in task_ids:
+            # nmap exits with status 1 on SIGTERM, so the scan learns it was
+            # cancelled from this marker rather than from its return code
+            self.redis.mark_cancelled(task_id)
             pid = self.redis.get_pid_for_task(task_id)
             if pid is None:
                 continue
@@ -169,7 +263,7 @@ class RedisProcessKiller:
                 _terminate_pid(pid, self.hostname)
                 
             except Exception as e:
-                logger.error(f"Failed to terminate PID for task_id={task_id}: {e}")
+                logger.error("Failed to terminate PID for task_id=%s: %s", task_id, e)
 
 
 class RedisWorkerCleaner:
@@ -179,7 +273,7 @@ class RedisWorkerCleaner:
         self.tool = tool
 
     def cleanup_task(self, task_id: str, project_id: str, user_id: str, ip: str, port_string: str):
-        logger.info(f"Cleaning up Redis records for task {task_id}")
+        logger.info("Cleaning up Redis records for task %s", task_id)
 
         # Build Redis keys
         hash_key = RedisKeyBuilder.running_tool_key(self.tool, self.hostname)
@@ -201,6 +295,8 @@ class RedisWorkerCleaner:
         pipe.srem(ip_key, task_id)
         pipe.delete(lock_key)
         pipe.delete(meta_key)
-        pipe.execute()
+        pipe.delete(RedisTaskTracker.cancel_key(task_id))
+        with metrics.REDIS_OPERATION_SECONDS.labels("cleanup_task").time():
+            pipe.execute()
 
-        logger.info(f"Redis cleanup completed for task {task_id}")
\ No newline at end of file
+        logger.info("Redis cleanup completed for task %s", task_id)
\ No newline at end of file
@@ -2,10 +2,13 @@ from uuid import UUID
 import requests
 import urllib3
 
+from app import metrics
 from app.config import config
 from app.logger import logger
+from app.tracing import tracer
 #from app.constants.task_schemas import ImportMode
 from falcoria_common.schemas.enums.common import ImportMode
+from .nmap_result import EnrichedNmapReport
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -14,7 +17,7 @@ class ScanledgerConnector:
     def __init__(self):
         self.server_url = config.backend_base_url.rstrip('/')
         self.auth_token = config.worker_backend_token
-        logger.debug(f"BackendConnector initialized with server URL: {self.server_url} and auth token: {self.auth_token}")
+        logger.debug("BackendConnector initialized with server URL: %s", self.server_url)
         self.session = requests.Session()
         self.session.verify = False  # Disable SSL verification for the whole session
         self.session.headers.update({"Authorization": f"Bearer {self.auth_token}"})
@@ -59,10 +62,10 @@ class ScanledgerConnector:
             return response
 
         except requests.RequestException as e:
-            logger.error(f"Request error: {e}")
+            logger.error("Request error: %s", e)
             return None
         except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+            logger.error("Unexpected error: %s", e)
             return None
 
     @staticmethod
@@ -74,25 +77,38 @@ class ScanledgerConnector:
         elif response.status_code == 401:
             logger.error("Unauthorized access (401).")
         else:
-            logger.error(f"Unexpected status: {response.status_code} - {response.text}")
+            logger.error("Unexpected status: %s - %s", response.status_code, response.text)
         return None
 
-    def upload_nmap_report(self, project_id: str, report: str, mode: ImportMode):
+    def upload_nmap_report(self, project_id: str, report: EnrichedNmapReport, mode: ImportMode):
         url = f"{self.server_url}/projects/{project_id}/ips/import"
 
+        # The report is only materialised as XML here, right before sending
+        with metrics.REPORT_PROCESSING_SECONDS.labels(project_id, mode.value, "render").time():
+            payload = report.to_bytes()
+        metrics.UPLOAD_SIZE_BYTES.labels(project_id, mode.value).observe(len(payload))
+
         files = {
-            "file": ("nmap_report.xml", report, "text/xml")
+            "file": ("nmap_report.xml", payload, "text/xml")
         }
 
-        response = self.make_request(
-            url=url,
-            method="POST",
-            query_params={"mode": mode.value},
-            files=files
-        )
+        with tracer.start_as_current_span("upload_nmap_report") as span, \
+                metrics.UPLOAD_SECONDS.labels(project_id, mode.value).time():
+            response = self.make_request(
+                url=url,
+                method="POST",
+                query_params={"mode": mode.value},
+                files=files
+            )
+            if response is not None:
+                span.set_attribute("http.status_code", response.status_code)
 
         if response is None:
+            metrics.UPLOAD_FAILURES.labels(project_id, mode.value).inc()
             logger.error("No response received from backend.")
             return None
 
-        return self.process_response(response)
+        result = self.process_response(response)
+        if result is None:
+            metrics.UPLOAD_FAILURES.labels(project_id, mode.value).inc()
+        return result
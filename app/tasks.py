@@ -1,63 +1,115 @@
 import time
 import socket
 
-from app.logger import logger
+from celery.signals import (
+    after_setup_logger,
+    after_setup_task_logger,
+    worker_process_shutdown,
+    worker_ready,
+)
+
+from app.logger import logger, worker_logging
 from app.celery_app import celery_app
 from app.redis_client import redis_client
 from falcoria_common.schemas.enums.celery_routes import NmapTasks, WorkerTasks
 from app.runtime.redis_wrappers import RedisNmapWrapper, RedisProcessKiller, RedisTaskTracker, RedisWorkerCleaner
 from app.runtime.update_ip import register_worker_ip
-from app.initializers import init_worker_ip
+from app.initializers import init_worker_ip, init_metrics, init_worker_tracing, init_heartbeat
+from app.metrics import QUEUE_WAIT_SECONDS, export_metrics_textfile
+from app.profiling import profile_task
+from app.tracing import tracer
 from app.config import config
 from falcoria_common.schemas.nmap import RunningNmapTarget, NmapTask
 
 
 init_worker_ip()
+init_metrics()
+init_worker_tracing()
+
+
+@after_setup_logger.connect
+@after_setup_task_logger.connect
+def route_celery_logs(logger=None, **kwargs):
+    # Celery's own records (task received/succeeded, unhandled tracebacks)
+    # go through the same redacting, non-blocking pipeline as ours
+    worker_logging.attach(logger)
+
+
+@worker_process_shutdown.connect
+def flush_logs(**kwargs):
+    worker_logging.flush()
+
+
+@worker_ready.connect
+def start_heartbeat(sender=None, **kwargs):
+    # Only the scan consumer has capacity worth advertising
+    queues = {queue.name for queue in sender.task_consumer.queues}
+    if config.nmap_scan_queue_name in queues:
+        autoscaler = getattr(sender.controller, "autoscaler", None)
+        if autoscaler is not None:
+            init_heartbeat(lambda: autoscaler.limit)
+        else:
+            init_heartbeat(lambda: sender.pool.num_processes)
 
 
 @celery_app.task(name=NmapTasks.NMAP_SCAN, bind=True)
 def scan_task(self, data):
     task = NmapTask(**data)
-    logger.info(f"Received scan task for {task.ip} in project {task.project}")
+    logger.info("Received scan task for %s in project %s", task.ip, task.project)
 
     tracker = RedisTaskTracker(str(task.project), "nmap")
     wrapper = RedisNmapWrapper(str(task.project))
     task_id = self.request.id
 
-    try:
-        target_metadata = RunningNmapTarget(
-            ip=task.ip,
-            hostnames=task.hostnames,
-            worker=config.hostname,
-            started_at=int(time.time()),
-        )
-
-        tracker.store_running_target(task_id, target_metadata)
-
-        logger.info(f"Starting 2-phase scan with Redis tracking for {task.ip}")
-        wrapper.run_two_phase_background(
-            target=task.ip,
-            hostnames=task.hostnames,
-            open_ports_opts=task.open_ports_opts,
-            service_opts=task.service_opts,
-            timeout=task.timeout,
-            include_services=task.include_services,
-            mode=task.mode,
-            task_id=task_id
-        )
-    finally:
-        # Guaranteed to run
-        cleaner = RedisWorkerCleaner(config.hostname, "nmap")
-        cleaner.cleanup_task(
-            task_id=task_id, 
-            project_id=str(task.project),
-            user_id=str(task.user.id),
-            ip=task.ip,
-            port_string=task.open_ports_str
-        )
-        tracker.release_ip_lock(task.ip)
-
-        logger.info(f"Removed IP {task.ip} from project:{task.project}:ip_task_map (via finally)")
+    # Optional header stamped by the publisher with the enqueue unix time
+    sent_at = getattr(self.request, "sent_at", None)
+    if sent_at:
+        QUEUE_WAIT_SECONDS.labels(str(task.project), task.mode.value).observe(max(0.0, time.time() - float(sent_at)))
+
+    span_attributes = {
+        "task.id": task_id,
+        "scan.project": str(task.project),
+        "scan.target": task.ip,
+        "scan.mode": task.mode.value,
+    }
+    with tracer.start_as_current_span("scan_task", attributes=span_attributes), \
+            profile_task(task_id, enabled=bool(data.get("profile", False))):
+        try:
+            target_metadata = RunningNmapTarget(
+                ip=task.ip,
+                hostnames=task.hostnames,
+                worker=config.hostname,
+                started_at=int(time.time()),
+            )
+
+            tracker.store_running_target(task_id, target_metadata)
+
+            logger.info("Starting 2-phase scan with Redis tracking for %s", task.ip)
+            wrapper.run_two_phase_background(
+                target=task.ip,
+                hostnames=task.hostnames,
+                open_ports_opts=task.open_ports_opts,
+                service_opts=task.service_opts,
+                timeout=task.timeout,
+                include_services=task.include_services,
+                mode=task.mode,
+                task_id=task_id
+            )
+        finally:
+            # Guaranteed to run
+            with tracer.start_as_current_span("cleanup_task"):
+                cleaner = RedisWorkerCleaner(config.hostname, "nmap")
+                cleaner.cleanup_task(
+                    task_id=task_id, 
+                    project_id=str(task.project),
+                    user_id=str(task.user.id),
+                    ip=task.ip,
+                    port_string=task.open_ports_str
+                )
+                tracker.release_ip_lock(task.ip)
+
+            logger.info("Removed IP %s from project:%s:ip_task_map (via finally)", task.ip, task.project)
+            export_metrics_textfile()
 
 
 @celery_app.task(name=NmapTasks.NMAP_CANCEL, bind=True)
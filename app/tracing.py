@@ -0,0 +1,47 @@
+import os
+
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+from app.config import config
+from app.logger import logger
+
+
+def _file_exporter(path: str) -> ConsoleSpanExporter:
+    # One JSON span per line, easy to tail into a collector or jq
+    out = open(path, "a", buffering=1)
+    return ConsoleSpanExporter(
+        out=out,
+        formatter=lambda span: span.to_json(indent=None) + os.linesep
+    )
+
+
+def init_tracing():
+    """
+    Installs a tracer provider when an exporter is configured. Without one
+    the OpenTelemetry API stays a no-op and spans cost next to nothing.
+    """
+    if not config.tracing_otlp_endpoint and not config.tracing_file:
+        return
+
+    provider = TracerProvider(
+        resource=Resource.create({
+            "service.name": config.tracing_service_name,
+            "host.name": config.hostname,
+        })
+    )
+
+    if config.tracing_otlp_endpoint:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=config.tracing_otlp_endpoint)))
+
+    if config.tracing_file:
+        provider.add_span_processor(BatchSpanProcessor(_file_exporter(config.tracing_file)))
+
+    trace.set_tracer_provider(provider)
+    logger.info("Tracing enabled")
+
+
+tracer = trace.get_tracer(config.celery_app_name)